@@ -7,29 +7,102 @@ Extrai data do nome do arquivo e cria schemas organizados
 import os
 import re
 import subprocess
+import tempfile
+import threading
+import multiprocessing
 import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+
+# Padrões de data no nome do dump numa única alternância. Cada ramo começa
+# com ".*?" e a busca é ancorada no início, de modo que a prioridade entre os
+# formatos é a mesma de testar os padrões um a um.
+_DATE_RE = re.compile(
+    r'(?:.*?dump-caf.*?-(?P<d8a>\d{8})-\d+'  # dump-caf_mapa-20250301-202506151151
+    r'|.*?caf.*?(?P<d8b>\d{8})'               # caf20250301 ou caf_20250301
+    r'|.*?(?P<dash>\d{4}-\d{2}-\d{2})'       # 2025-03-01
+    r'|.*?(?P<d8c>\d{8}))',                   # 20250301
+    re.DOTALL,
+)
 
 
 class CAFDumpImporter:
     """Importador de dumps CAF para PostgreSQL"""
     
+    # Memória dos índices/constraints criados após a carga, nos dois formatos
+    # de dump. Cada job do pg_restore abre sua própria sessão com esse valor
+    MAINTENANCE_WORK_MEM = '1GB'
+    
+    # Parâmetros de sessão aplicados apenas durante o restore (carga em massa).
+    # Como valem só para a sessão do psql/pg_restore, voltam ao padrão do
+    # servidor (ex.: synchronous_commit=on) assim que a importação termina.
+    RESTORE_SESSION_SETTINGS = {
+        'maintenance_work_mem': MAINTENANCE_WORK_MEM,
+        'work_mem': '16MB',
+        'synchronous_commit': 'off',
+        'max_parallel_maintenance_workers': '4',
+    }
+    
+    # Assinatura do formato custom do pg_dump (-Fc)
+    CUSTOM_DUMP_MAGIC = b'PGDMP'
+    
+    # Jobs paralelos do pg_restore para dumps custom/directory
+    RESTORE_JOBS = min(4, os.cpu_count() or 1)
+    
+    # Máximo de dumps importados simultaneamente
+    MAX_PARALLEL_IMPORTS = 4
+    
+    # Linhas finais do stderr do restore mantidas para relatar erros
+    STDERR_TAIL_LINES = 200
+    
+    # Bytes iniciais de um dump SQL texto inspecionados no cabeçalho do pg_dump
+    PLAIN_HEADER_BYTES = 64 * 1024
+    
     def __init__(self, db_config: dict):
         self.db_config = db_config
         self.dumps_dir = Path("/dumps")
+        self._conn = None
+        self._pending_metadata: List[Tuple] = []
+        self._file_sizes_mb: Dict[Path, float] = {}
+    
+    def get_connection(self):
+        """Retorna a conexão persistente usada nas operações de metadados"""
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**self.db_config)
+        return self._conn
+    
+    def close_connection(self) -> None:
+        """Fecha a conexão persistente, se aberta"""
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+    
+    def _rollback(self) -> None:
+        """Desfaz a transação corrente para a conexão continuar utilizável"""
+        if self._conn is not None and not self._conn.closed:
+            self._conn.rollback()
         
     def find_caf_dumps(self) -> List[Path]:
         """Encontra todos os dumps CAF no diretório"""
         caf_dumps = []
         
         if self.dumps_dir.exists():
-            # Buscar arquivos que contenham "caf" no nome
-            patterns = ["*caf*.sql", "*caf*.dump", "*CAF*.sql", "*CAF*.dump"]
-            
-            for pattern in patterns:
-                caf_dumps.extend(self.dumps_dir.glob(pattern))
+            # Uma única leitura do diretório: arquivos com "caf" no nome
+            # (qualquer caixa) e extensão .sql/.dump
+            with os.scandir(self.dumps_dir) as entries:
+                for entry in entries:
+                    name = entry.name.lower()
+                    if 'caf' in name and name.endswith(('.sql', '.dump')):
+                        dump_path = Path(entry.path)
+                        # Guardar o tamanho já obtido pelo scandir
+                        self._file_sizes_mb[dump_path] = entry.stat().st_size / (1024 * 1024)
+                        caf_dumps.append(dump_path)
         
         # Ordenar por nome (que geralmente contém data)
         return sorted(caf_dumps, key=lambda x: x.name)
@@ -39,25 +112,17 @@ class CAFDumpImporter:
         Extrai data do nome do arquivo dump
         Suporta formatos: dump-caf_mapa-20250301-202506151151.sql
         """
-        patterns = [
-            r'dump-caf.*?-(\d{8})-\d+',  # dump-caf_mapa-20250301-202506151151
-            r'caf.*?(\d{8})',             # caf20250301 ou caf_20250301
-            r'(\d{4}-\d{2}-\d{2})',       # 2025-03-01
-            r'(\d{8})',                   # 20250301
-        ]
+        match = _DATE_RE.match(filename)
+        if not match:
+            return None
         
-        for pattern in patterns:
-            match = re.search(pattern, filename)
-            if match:
-                date_str = match.group(1)
-                # Converter para formato padrão YYYYMMDD
-                if '-' in date_str:
-                    date_str = date_str.replace('-', '')
-                
-                if len(date_str) == 8 and date_str.isdigit():
-                    return date_str
+        # Os grupos já garantem 8 dígitos (ou AAAA-MM-DD), sem revalidar
+        date_str = match.group('d8a') or match.group('d8b') or match.group('d8c')
+        if date_str is None:
+            # Converter para formato padrão YYYYMMDD
+            date_str = match.group('dash').replace('-', '')
         
-        return None
+        return date_str
     
     def generate_schema_name(self, date_str: Optional[str]) -> str:
         """Gera nome do schema baseado na data"""
@@ -68,18 +133,19 @@ class CAFDumpImporter:
             return f"caf_{datetime.now().strftime('%Y%m%d')}"
     
     def get_file_size_mb(self, file_path: Path) -> float:
-        """Retorna tamanho do arquivo em MB"""
-        return file_path.stat().st_size / (1024 * 1024)
+        """Retorna tamanho do arquivo em MB (stat feito uma vez por arquivo)"""
+        size_mb = self._file_sizes_mb.get(file_path)
+        if size_mb is None:
+            size_mb = file_path.stat().st_size / (1024 * 1024)
+            self._file_sizes_mb[file_path] = size_mb
+        return size_mb
     
     def create_schema(self, schema_name: str) -> bool:
         """Cria schema no banco se não existir"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = self.get_connection()
             with conn.cursor() as cur:
-                # Criar schema
-                cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
-                
-                # Adicionar comentário
+                # Comentário do schema
                 date_part = schema_name.replace('caf_', '')
                 if len(date_part) == 8:
                     formatted_date = f"{date_part[:4]}-{date_part[4:6]}-{date_part[6:8]}"
@@ -87,19 +153,87 @@ class CAFDumpImporter:
                 else:
                     comment = f"Schema para dump CAF ({schema_name})"
                 
-                cur.execute(f"COMMENT ON SCHEMA \"{schema_name}\" IS '{comment}'")
+                # Criar schema e comentar numa única ida ao servidor. O commit
+                # precisa ocorrer antes do restore, que usa outra sessão.
+                cur.execute(
+                    sql.SQL(
+                        'CREATE SCHEMA IF NOT EXISTS {schema}; '
+                        'COMMENT ON SCHEMA {schema} IS {comment}'
+                    ).format(
+                        schema=sql.Identifier(schema_name),
+                        comment=sql.Literal(comment)
+                    )
+                )
                 
                 conn.commit()
                 
-            conn.close()
             return True
             
         except Exception as e:
+            self._rollback()
             print(f"❌ Erro ao criar schema {schema_name}: {e}")
             return False
     
+    def restore_session_options(self) -> str:
+        """Monta PGOPTIONS com os parâmetros de sessão para o restore"""
+        return ' '.join(
+            f'-c {name}={value}'
+            for name, value in self.RESTORE_SESSION_SETTINGS.items()
+        )
+    
+    def detect_dump_format(self, dump_file: Path) -> str:
+        """Identifica o formato do dump: 'custom', 'directory' ou 'plain'"""
+        if dump_file.is_dir():
+            return 'directory' if (dump_file / 'toc.dat').exists() else 'plain'
+        
+        try:
+            with open(dump_file, 'rb') as f:
+                magic = f.read(len(self.CUSTOM_DUMP_MAGIC))
+        except OSError:
+            return 'plain'
+        
+        return 'custom' if magic == self.CUSTOM_DUMP_MAGIC else 'plain'
+    
+    def plain_dump_resets_search_path(self, dump_file: Path) -> bool:
+        """
+        Verifica se o cabeçalho do dump SQL texto zera o search_path.
+        O pg_dump moderno emite set_config('search_path', '', false) e
+        qualifica todos os objetos (public.tabela), o que anula o
+        SET search_path do wrapper: os objetos vão para o schema original.
+        """
+        try:
+            with open(dump_file, 'rb') as f:
+                header = f.read(self.PLAIN_HEADER_BYTES)
+        except OSError:
+            return False
+        return b"set_config('search_path'" in header
+    
+    def write_sql_wrapper(self, dump_file: Path, schema_name: str) -> Path:
+        """Gera script psql que direciona o dump SQL texto para o schema"""
+        dump_path = str(dump_file.resolve()).replace("'", "''")
+        with tempfile.NamedTemporaryFile(
+            'w', prefix=f'{schema_name}_', suffix='.sql', delete=False
+        ) as f:
+            f.write(f'SET search_path TO "{schema_name}", public;\n')
+            f.write(f"\\i '{dump_path}'\n")
+        return Path(f.name)
+    
+    @staticmethod
+    def _drain_stream(stream, tail: deque) -> None:
+        """
+        Consome a saída do processo linha a linha, mantendo só o final.
+        Lê bytes e decodifica com substituição: um byte fora do UTF-8 não
+        pode encerrar a leitura enquanto o processo ainda escreve no pipe
+        """
+        try:
+            for line in stream:
+                tail.append(line.decode('utf-8', errors='replace'))
+        finally:
+            stream.close()
+    
     def import_dump(self, dump_file: Path, schema_name: str) -> bool:
         """Importa dump para o schema especificado"""
+        wrapper_file = None
         try:
             print(f"📥 Importando {dump_file.name} para schema {schema_name}...")
             
@@ -110,106 +244,160 @@ class CAFDumpImporter:
                 'PGUSER': self.db_config['user'],
                 'PGHOST': self.db_config['host'],
                 'PGPORT': str(self.db_config['port']),
-                'PGDATABASE': self.db_config['database']
+                'PGDATABASE': self.db_config['database'],
+                # Ajustes de memória/WAL válidos só para a sessão do restore
+                'PGOPTIONS': self.restore_session_options()
             })
             
-            # Comando para importar dump
-            if dump_file.suffix == '.sql':
-                # Arquivo SQL texto
+            # Comando para importar dump (decidido pelo conteúdo, não pela extensão)
+            dump_format = self.detect_dump_format(dump_file)
+            if dump_format == 'plain':
+                # Arquivo SQL texto: reexecuta INSERT/COPY um a um, sem paralelismo
+                print(f"⚠️  {dump_file.name} é SQL texto; prefira pg_dump -Fc/-Fd "
+                      f"para restaurar em paralelo com pg_restore")
+                if self.plain_dump_resets_search_path(dump_file):
+                    print(f"⚠️  {dump_file.name} zera o search_path e qualifica os "
+                          f"objetos; eles serão criados nos schemas originais "
+                          f"(ex.: public), não em {schema_name}")
+                wrapper_file = self.write_sql_wrapper(dump_file, schema_name)
+                # Sem ON_ERROR_STOP/--single-transaction: erros inofensivos do
+                # dump (OWNER TO de role inexistente, CREATE EXTENSION já
+                # instalada) não devem desfazer a carga inteira
                 cmd = [
                     'psql',
                     '-v', f'schema_name={schema_name}',
-                    '-f', str(dump_file),
+                    '-f', str(wrapper_file),
                     '-q'  # Modo silencioso
                 ]
             else:
-                # Arquivo binário (pg_dump custom format)
+                # Formato custom/directory do pg_dump: carga em paralelo, com
+                # índices e constraints criados depois dos dados
                 cmd = [
                     'pg_restore',
+                    '-d', self.db_config['database'],
                     '-n', schema_name,  # Restaurar apenas para esse schema
+                    '-j', str(self.RESTORE_JOBS),
                     '-v',
                     str(dump_file)
                 ]
             
-            # Executar importação
-            result = subprocess.run(
+            # Executar importação sem acumular toda a saída em memória:
+            # stdout é descartado e do stderr guardamos só as últimas linhas
+            proc = subprocess.Popen(
                 cmd,
                 env=env,
-                capture_output=True,
-                text=True,
-                timeout=3600  # Timeout de 1 hora
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE
+            )
+            stderr_tail = deque(maxlen=self.STDERR_TAIL_LINES)
+            drain = threading.Thread(
+                target=self._drain_stream,
+                args=(proc.stderr, stderr_tail),
+                daemon=True
             )
+            drain.start()
+            
+            try:
+                returncode = proc.wait(timeout=3600)  # Timeout de 1 hora
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                drain.join()
+                print(f"❌ Timeout na importação de {dump_file.name}")
+                return False
             
-            if result.returncode == 0:
+            drain.join()
+            
+            if returncode == 0:
                 print(f"✅ {dump_file.name} importado com sucesso!")
                 return True
             else:
-                print(f"❌ Erro na importação: {result.stderr}")
+                print(f"❌ Erro na importação: {''.join(stderr_tail)}")
                 return False
                 
         except Exception as e:
             print(f"❌ Erro ao importar {dump_file.name}: {e}")
             return False
+        finally:
+            if wrapper_file is not None:
+                wrapper_file.unlink(missing_ok=True)
     
     def register_dump_metadata(self, dump_file: Path, schema_name: str, 
                              success: bool, tables_count: int = 0, 
                              records_count: int = 0) -> None:
-        """Registra metadados do dump importado"""
+        """Enfileira metadados do dump importado (gravados em flush_dump_metadata)"""
+        # Extrair data do arquivo
+        date_str = self.extract_date_from_filename(dump_file.name)
+        dump_date = None
+        if date_str:
+            dump_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
+        
+        self._pending_metadata.append((
+            dump_file.name,
+            schema_name,
+            dump_date,
+            self.get_file_size_mb(dump_file),
+            tables_count,
+            records_count,
+            'Importado com sucesso' if success else 'Falha na importação'
+        ))
+    
+    def flush_dump_metadata(self) -> None:
+        """Grava de uma vez os metadados enfileirados (um grupo de schema)"""
+        if not self._pending_metadata:
+            return
+        
         try:
-            conn = psycopg2.connect(**self.db_config)
-            
-            # Extrair data do arquivo
-            date_str = self.extract_date_from_filename(dump_file.name)
-            dump_date = None
-            if date_str:
-                dump_date = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}"
+            conn = self.get_connection()
             
             with conn.cursor() as cur:
-                cur.execute("""
+                execute_values(cur, """
                     INSERT INTO caf_analysis.dump_metadata 
                     (dump_file, schema_name, dump_date, file_size_mb, 
                      tables_count, records_count, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    dump_file.name,
-                    schema_name,
-                    dump_date,
-                    self.get_file_size_mb(dump_file),
-                    tables_count,
-                    records_count,
-                    'Importado com sucesso' if success else 'Falha na importação'
-                ))
+                    VALUES %s
+                """, self._pending_metadata, page_size=500)
                 
                 conn.commit()
-                
-            conn.close()
             
+            self._pending_metadata.clear()
+                
         except Exception as e:
+            self._rollback()
             print(f"⚠️  Erro ao registrar metadados: {e}")
     
     def count_schema_objects(self, schema_name: str) -> Dict[str, int]:
         """Conta tabelas e registros no schema"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = self.get_connection()
             
             with conn.cursor() as cur:
-                # Contar tabelas
+                # Logo após o restore o reltuples vale -1 (nunca analisada);
+                # ANALYZE atualiza as estatísticas por amostragem, bem mais
+                # barato que um COUNT(*) por tabela
                 cur.execute("""
-                    SELECT COUNT(*) 
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s AND table_type = 'BASE TABLE'
+                    SELECT c.relname
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
                 """, (schema_name,))
-                tables_count = cur.fetchone()[0]
+                for (table_name,) in cur.fetchall():
+                    cur.execute(sql.SQL('ANALYZE {}').format(
+                        sql.Identifier(schema_name, table_name)
+                    ))
                 
-                # Contar registros totais (aproximado)
+                # Contar tabelas e registros (estimativa do catálogo, sem
+                # varrer as tabelas) numa única consulta
                 cur.execute("""
-                    SELECT COALESCE(SUM(n_tup_ins + n_tup_upd), 0)
-                    FROM pg_stat_user_tables 
-                    WHERE schemaname = %s
+                    SELECT COUNT(*),
+                           COALESCE(SUM(GREATEST(c.reltuples, 0))::bigint, 0)
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
                 """, (schema_name,))
-                records_count = cur.fetchone()[0] or 0
+                tables_count, records_count = cur.fetchone()
                 
-            conn.close()
+            conn.commit()
             
             return {
                 'tables_count': tables_count,
@@ -217,9 +405,76 @@ class CAFDumpImporter:
             }
             
         except Exception as e:
+            self._rollback()
             print(f"⚠️  Erro ao contar objetos do schema: {e}")
             return {'tables_count': 0, 'records_count': 0}
     
+    def schema_name_for(self, dump_file: Path) -> str:
+        """Nome do schema de destino de um dump"""
+        date_str = self.extract_date_from_filename(dump_file.name)
+        return self.generate_schema_name(date_str)
+    
+    def group_dumps_by_schema(self, dumps: List[Path]) -> Dict[str, List[Path]]:
+        """Agrupa os dumps pelo schema de destino, preservando a ordem por nome"""
+        groups: Dict[str, List[Path]] = {}
+        for dump_file in dumps:
+            groups.setdefault(self.schema_name_for(dump_file), []).append(dump_file)
+        return groups
+    
+    def _process_one(self, dump_file: Path, schema_name: str) -> Dict:
+        """Cria o schema, restaura o dump e conta os objetos importados"""
+        print(f"\n📋 Processando: {dump_file.name}")
+        print(f"   Schema: {schema_name}")
+        
+        result = {
+            'dump_file': dump_file,
+            'schema_name': schema_name,
+            'schema_created': False,
+            'success': False,
+            'tables_count': 0,
+            'records_count': 0
+        }
+        
+        try:
+            # Criar schema
+            if not self.create_schema(schema_name):
+                print(f"   ❌ Falha ao criar schema")
+                return result
+            result['schema_created'] = True
+            
+            # Importar dump
+            result['success'] = self.import_dump(dump_file, schema_name)
+            
+            # Contar objetos importados
+            if result['success']:
+                stats = self.count_schema_objects(schema_name)
+                result.update(stats)
+                print(f"   📊 {stats['tables_count']} tabelas, ~{stats['records_count']:,} registros")
+        finally:
+            self.close_connection()
+        
+        return result
+    
+    def max_parallel_imports(self, dumps_count: int) -> int:
+        """Limita importações simultâneas por CPU e por max_connections do PostgreSQL"""
+        workers = min(self.MAX_PARALLEL_IMPORTS, os.cpu_count() or 1, dumps_count)
+        
+        try:
+            conn = self.get_connection()
+            with conn.cursor() as cur:
+                cur.execute("SHOW max_connections")
+                max_connections = int(cur.fetchone()[0])
+            conn.commit()
+        except Exception as e:
+            self._rollback()
+            print(f"⚠️  Erro ao consultar max_connections: {e}")
+            return 1
+        
+        # Cada importação usa os jobs do pg_restore + a conexão de metadados,
+        # e deixamos metade das conexões do servidor livre para outros clientes
+        per_import = self.RESTORE_JOBS + 1
+        return max(1, min(workers, (max_connections // 2) // per_import))
+    
     def import_all_caf_dumps(self) -> None:
         """Importa todos os dumps CAF encontrados"""
         dumps = self.find_caf_dumps()
@@ -235,43 +490,58 @@ class CAFDumpImporter:
         
         print("\n🚀 Iniciando importação...")
         
-        for dump_file in dumps:
-            # Extrair data e gerar nome do schema
-            date_str = self.extract_date_from_filename(dump_file.name)
-            schema_name = self.generate_schema_name(date_str)
-            
-            print(f"\n📋 Processando: {dump_file.name}")
-            print(f"   Schema: {schema_name}")
+        # Dumps com a mesma data (ou sem data, que caem no schema do dia)
+        # apontam para o mesmo schema; restaurá-los ao mesmo tempo faria dois
+        # processos disputarem o CREATE SCHEMA e gravarem nas mesmas tabelas.
+        # Cada grupo roda em série dentro de um único worker.
+        groups = self.group_dumps_by_schema(dumps)
+        for schema_name, group in groups.items():
+            if len(group) > 1:
+                names = ', '.join(dump.name for dump in group)
+                print(f"⚠️  {len(group)} dumps para o schema {schema_name} "
+                      f"serão importados em sequência: {names}")
+        
+        max_workers = self.max_parallel_imports(len(groups))
+        print(f"   {max_workers} importação(ões) em paralelo")
+        
+        # Grupos distintos vão para schemas distintos, então as importações
+        # são independentes. "spawn" evita que os workers herdem a conexão aberta.
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            futures = [
+                executor.submit(_process_dump_group_worker, self.db_config,
+                                schema_name, group)
+                for schema_name, group in groups.items()
+            ]
             
-            # Criar schema
-            if self.create_schema(schema_name):
-                # Importar dump
-                success = self.import_dump(dump_file, schema_name)
-                
-                # Contar objetos importados
-                if success:
-                    stats = self.count_schema_objects(schema_name)
-                    print(f"   📊 {stats['tables_count']} tabelas, ~{stats['records_count']:,} registros")
-                else:
-                    stats = {'tables_count': 0, 'records_count': 0}
+            for future in as_completed(futures):
+                for result in future.result():
+                    if not result['schema_created']:
+                        continue
+                    
+                    # Registrar metadados
+                    self.register_dump_metadata(
+                        result['dump_file'], result['schema_name'], result['success'],
+                        result['tables_count'], result['records_count']
+                    )
                 
-                # Registrar metadados
-                self.register_dump_metadata(
-                    dump_file, schema_name, success,
-                    stats['tables_count'], stats['records_count']
-                )
-            else:
-                print(f"   ❌ Falha ao criar schema")
+                # Gravar os metadados do grupo assim que ele termina (um
+                # execute_values por grupo), para que uma interrupção no meio
+                # da execução não perca o registro dos schemas já restaurados
+                self.flush_dump_metadata()
         
         print(f"\n🎉 Importação concluída!")
         
         # Mostrar resumo
         self.show_import_summary()
+        self.close_connection()
     
     def show_import_summary(self) -> None:
         """Mostra resumo dos dumps importados"""
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = self.get_connection()
             
             with conn.cursor() as cur:
                 cur.execute("""
@@ -284,7 +554,7 @@ class CAFDumpImporter:
                 
                 rows = cur.fetchall()
                 
-            conn.close()
+            conn.commit()
             
             if rows:
                 print(f"\n📊 Resumo dos dumps importados:")
@@ -302,9 +572,17 @@ class CAFDumpImporter:
                     print()
                     
         except Exception as e:
+            self._rollback()
             print(f"⚠️  Erro ao mostrar resumo: {e}")
 
 
+def _process_dump_group_worker(db_config: dict, schema_name: str,
+                               dump_files: List[Path]) -> List[Dict]:
+    """Processa em série, num worker, os dumps de um mesmo schema"""
+    importer = CAFDumpImporter(db_config)
+    return [importer._process_one(dump_file, schema_name) for dump_file in dump_files]
+
+
 def main():
     """Função principal"""
     print("🐘 Importador de Dumps CAF para PostgreSQL\n")
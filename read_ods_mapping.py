@@ -3,34 +3,128 @@
 Script para ler o arquivo ODS e extrair o mapeamento de campos da aba unidade_familiar
 """
 
-import pandas as pd
+import csv
+import shutil
+import subprocess
+import tempfile
 from pathlib import Path
 
+SHEET_NAME = 'unidade_familiar'
+ODS_PATH = Path("de_para_mongo_postgres_caf.ods")
+CSV_PATH = Path("de_para_unidade_familiar.csv")
+
+# Filtro CSV do LibreOffice: separador ',', aspas '"', UTF-8 (76), começando
+# na linha 1; o último token (-1) exporta cada aba para "<arquivo>-<aba>.csv"
+LIBREOFFICE_CSV_FILTER = 'csv:Text - txt - csv (StarCalc):44,34,76,1,,0,false,true,false,false,false,-1'
+
+def _cell_text(cell):
+    """Texto de uma célula ODF (parágrafos separados por quebra de linha)"""
+    from odf import teletype
+    from odf.text import P
+    
+    return "\n".join(teletype.extractText(p) for p in cell.getElementsByType(P))
+
+def _trim_rows(rows):
+    """Remove células vazias ao final de cada linha e linhas vazias ao final"""
+    rows = [list(r) for r in rows]
+    for values in rows:
+        while values and values[-1] == '':
+            values.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+def read_sheet_libreoffice(file_path, sheet_name):
+    """Converte o ODS com o LibreOffice headless (parser nativo) e lê a aba do CSV"""
+    binary = shutil.which('libreoffice') or shutil.which('soffice')
+    if binary is None:
+        return None
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        subprocess.run(
+            [binary, '--headless', '--convert-to', LIBREOFFICE_CSV_FILTER,
+             '--outdir', tmpdir, str(file_path)],
+            check=True, timeout=60,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        csv_file = Path(tmpdir) / f"{Path(file_path).stem}-{sheet_name}.csv"
+        if not csv_file.exists():
+            return None
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            return _trim_rows(csv.reader(f))
+
+def read_ods_sheet(file_path, sheet_name):
+    """Lê uma aba do ODS, retornando as linhas como listas de texto"""
+    try:
+        rows = read_sheet_libreoffice(file_path, sheet_name)
+    except (subprocess.SubprocessError, OSError) as e:
+        print(f"⚠️  Conversão via LibreOffice falhou ({e}); lendo o XML do ODS")
+        rows = None
+    
+    if rows is None:
+        rows = read_sheet_odf(file_path, sheet_name)
+    return rows
+
+def read_sheet_odf(file_path, sheet_name):
+    """Lê uma aba do ODS direto do XML com odfpy"""
+    from odf.opendocument import load
+    from odf.table import Table, TableRow
+    
+    doc = load(file_path)
+    tables = [t for t in doc.spreadsheet.getElementsByType(Table)
+              if t.getAttribute('name') == sheet_name]
+    if not tables:
+        raise ValueError(f"Aba '{sheet_name}' não encontrada em {file_path}")
+    
+    rows = []
+    for row in tables[0].getElementsByType(TableRow):
+        values = []
+        for cell in row.childNodes:
+            if cell.qname[1] not in ('table-cell', 'covered-table-cell'):
+                continue
+            repeat = int(cell.getAttribute('numbercolumnsrepeated') or 1)
+            values.extend([_cell_text(cell)] * repeat)
+        
+        repeat = int(row.getAttribute('numberrowsrepeated') or 1)
+        rows.extend([values] * repeat)
+    
+    # O ODS repete células/linhas vazias até o limite da planilha
+    return _trim_rows(rows)
+
 def read_ods_mapping():
     """Lê o arquivo ODS e extrai o mapeamento de campos"""
     
     try:
         # Ler arquivo ODS - aba unidade_familiar
-        file_path = "de_para_mongo_postgres_caf.ods"
+        file_path = str(ODS_PATH)
+        
+        # Ler a aba direto do XML; a primeira linha vira o cabeçalho
+        rows = read_ods_sheet(file_path, SHEET_NAME)
+        width = max((len(r) for r in rows), default=0)
+        header = rows[0] + [''] * (width - len(rows[0])) if rows else []
+        columns = [col or f"Unnamed: {i}" for i, col in enumerate(header)]
         
-        # Tentar ler com pandas
-        df = pd.read_excel(file_path, sheet_name='unidade_familiar', engine='odf')
+        mapping = [
+            dict(zip(columns, row + [''] * (width - len(row))))
+            for row in rows[1:]
+        ]
         
         print("📋 Mapeamento PostgreSQL → MongoDB (Aba: unidade_familiar)")
         print("=" * 70)
         
         # Mostrar as colunas disponíveis
         print("🔍 Colunas encontradas:")
-        for i, col in enumerate(df.columns):
+        for i, col in enumerate(columns):
             print(f"   {i+1}. {col}")
         
-        print(f"\n📊 Total de registros: {len(df)}")
+        print(f"\n📊 Total de registros: {len(mapping)}")
         
         # Mostrar primeiras linhas
         print(f"\n📄 Primeiras 10 linhas:")
-        print(df.head(10).to_string())
+        for record in mapping[:10]:
+            print(" | ".join(record.values()))
         
-        return df
+        return mapping
         
     except Exception as e:
         print(f"❌ Erro ao ler arquivo ODS: {e}")
@@ -43,8 +137,19 @@ def read_ods_mapping():
         
         return None
 
+def read_cached_mapping():
+    """Lê o CSV já gerado, se estiver atualizado em relação ao ODS"""
+    
+    if not CSV_PATH.exists():
+        return None
+    if ODS_PATH.exists() and CSV_PATH.stat().st_mtime < ODS_PATH.stat().st_mtime:
+        return None
+    
+    with open(CSV_PATH, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
 def install_odf_support():
-    """Instala suporte para arquivos ODF se necessário"""
+    """Instala suporte para arquivos ODF se necessário (fallback sem LibreOffice)"""
     
     try:
         import odf
@@ -55,20 +160,35 @@ def install_odf_support():
         subprocess.run(["pip", "install", "odfpy"], check=True)
         print("✅ Suporte ODF instalado")
 
-if __name__ == "__main__":
-    print("🔍 Lendo arquivo de mapeamento PostgreSQL → MongoDB")
+def convert_ods_to_csv():
+    """Converte a aba do ODS para CSV, reaproveitando o CSV se ainda atualizado"""
     
-    # Instalar suporte ODF se necessário
-    install_odf_support()
+    # Reaproveitar o CSV se o ODS não mudou desde a última conversão
+    mapping = read_cached_mapping()
+    if mapping is not None:
+        print(f"✅ {CSV_PATH} já está atualizado ({len(mapping)} registros)")
+        return mapping
+    
+    # Instalar suporte ODF se necessário (só usado sem o LibreOffice)
+    if not (shutil.which('libreoffice') or shutil.which('soffice')):
+        install_odf_support()
     
     # Ler mapeamento
-    mapping_df = read_ods_mapping()
+    mapping = read_ods_mapping()
     
-    if mapping_df is not None:
+    if mapping is not None:
         # Salvar como CSV para facilitar uso futuro
-        csv_path = "de_para_unidade_familiar.csv"
-        mapping_df.to_csv(csv_path, index=False, encoding='utf-8')
-        print(f"\n💾 Mapeamento salvo como: {csv_path}")
+        with open(CSV_PATH, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(mapping[0]) if mapping else [], lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(mapping)
+        print(f"\n💾 Mapeamento salvo como: {CSV_PATH}")
     else:
         print("\n❌ Não foi possível ler o arquivo ODS")
         print("📝 Por favor, exporte a aba 'unidade_familiar' como CSV")
+    
+    return mapping
+
+if __name__ == "__main__":
+    print("🔍 Lendo arquivo de mapeamento PostgreSQL → MongoDB")
+    convert_ods_to_csv()
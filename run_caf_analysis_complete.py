@@ -4,10 +4,104 @@ Script unificado para análise incremental CAF
 Executa análise tanto para unidade_familiar quanto para unidade_familiar_pessoa
 """
 
+import os
 import sys
-import subprocess
+import time
+import importlib
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+# Fases da análise: (título, módulo, função, recebe limite). As fases gravam
+# em coleções MongoDB independentes e por isso podem rodar em paralelo
+ANALYSIS_PHASES = [
+    ("📊 UNIDADE FAMILIAR", 'run_caf_analysis_mapped', 'run_incremental_analysis_with_mapping', True),
+    ("👥 UNIDADE FAMILIAR PESSOA", 'run_caf_analysis_pessoa', 'run_incremental_pessoa_analysis', True),
+    ("📍 ENDEREÇOS", 'run_caf_analysis_endereco', 'run_incremental_endereco_analysis', True),
+    ("🏠 ÁREA IMÓVEL", 'run_caf_analysis_area_imovel', 'analyze_area_imovel_incremental', True),
+    ("💰 RENDA", 'run_caf_analysis_renda', 'analyze_renda_incremental', True),
+    ("👤 FUNCIONÁRIO UFPR", 'run_caf_analysis_funcionario_ufpr', 'main', False),
+]
+
+# Fases de análise simultâneas: cada uma abre seus próprios pools no
+# PostgreSQL e no MongoDB, então o paralelismo é limitado
+PHASE_WORKERS = 2
+
+# Relatórios finais: (título, módulo, função), executados em sequência
+REPORT_PHASES = [
+    ("📊 RESUMO UNIDADE FAMILIAR:", 'verify_updates', 'verify_recent_updates'),
+    ("👥 RESUMO UNIDADE FAMILIAR PESSOA:", 'verify_pessoa_updates', 'verify_pessoa_updates'),
+    ("📍 RESUMO ENDEREÇOS:", 'verify_endereco_updates', 'verify_endereco_updates'),
+    ("🏠 RESUMO ÁREA IMÓVEL:", 'verify_area_imovel_updates', 'verify_area_imovel_updates'),
+    ("💰 RESUMO RENDA:", 'verify_renda_updates', 'verify_renda_updates'),
+    ("👤 RESUMO FUNCIONÁRIO UFPR:", 'verify_funcionario_ufpr_updates', 'main'),
+]
+
+def _run_phase(module_name: str, function_name: str, accepts_limit: bool, limit: int = None):
+    """Executa uma fase em um processo do pool, importando o módulo no próprio worker"""
+    function = getattr(importlib.import_module(module_name), function_name)
+    if accepts_limit:
+        function(limit)
+    else:
+        function()
+
+def _relay_lines(read_fd: int, out_fd: int, prefix: bytes) -> None:
+    """Repassa a saída da fase linha a linha, com o prefixo da fase"""
+    with os.fdopen(read_fd, 'rb') as pipe:
+        for line in pipe:
+            os.write(out_fd, prefix + line)
+
+def _run_analysis_phase(number: int, title: str, module_name: str, function_name: str,
+                        accepts_limit: bool, limit: int = None) -> dict:
+    """
+    Executa uma fase de análise no worker, transmitindo cada linha da saída
+    com o prefixo "[FASE N]" assim que é escrita. O redirecionamento é feito
+    nos descritores 1 e 2, de modo que os processos criados pela fase (pools
+    "spawn") herdam o mesmo destino. Devolve a duração e o erro (traceback)
+    """
+    original_fd = os.dup(1)
+    read_fd, write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(write_fd, 1)
+    os.dup2(write_fd, 2)
+    os.close(write_fd)
+    # Saída por linha também no pipe, inclusive nos processos filhos
+    os.environ['PYTHONUNBUFFERED'] = '1'
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+    
+    relay = threading.Thread(
+        target=_relay_lines,
+        args=(read_fd, original_fd, f"[FASE {number}] ".encode()),
+        daemon=True
+    )
+    relay.start()
+    
+    error = None
+    started = time.perf_counter()
+    try:
+        icon, name = title.split(' ', 1)
+        print(f"{icon} FASE {number}: ANÁLISE {name}")
+        _run_phase(module_name, function_name, accepts_limit, limit)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Restaurar os descritores fecha o pipe e encerra o repasse
+        os.dup2(original_fd, 1)
+        os.dup2(original_fd, 2)
+        relay.join()
+        os.close(original_fd)
+    
+    return {
+        'elapsed': time.perf_counter() - started,
+        'error': error
+    }
+
 def run_unified_analysis(limit: int = None):
     """Executa análise completa do sistema CAF"""
     
@@ -18,154 +112,41 @@ def run_unified_analysis(limit: int = None):
     if limit:
         print(f"🔢 LIMITE: {limit} alterações por schema")
     
-    # Executar análise de unidade familiar
-    print("\n" + "="*80)
-    print("📊 FASE 1: ANÁLISE UNIDADE FAMILIAR")
-    print("="*80)
-    
-    try:
-        if limit:
-            result1 = subprocess.run([
-                'python', 'run_caf_analysis_mapped.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result1 = subprocess.run([
-                'python', 'run_caf_analysis_mapped.py'
-            ], capture_output=False, text=True)
-        
-        if result1.returncode == 0:
-            print("✅ Análise de unidade familiar concluída com sucesso")
-        else:
-            print("❌ Erro na análise de unidade familiar")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de unidade familiar: {e}")
-        return False
-    
-    # Executar análise de pessoa
     print("\n" + "="*80)
-    print("👥 FASE 2: ANÁLISE UNIDADE FAMILIAR PESSOA")
+    print(f"🚀 EXECUTANDO {len(ANALYSIS_PHASES)} ANÁLISES ({PHASE_WORKERS} POR VEZ)")
     print("="*80)
-    
-    try:
-        if limit:
-            result2 = subprocess.run([
-                'python', 'run_caf_analysis_pessoa.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result2 = subprocess.run([
-                'python', 'run_caf_analysis_pessoa.py'
-            ], capture_output=False, text=True)
-        
-        if result2.returncode == 0:
-            print("✅ Análise de unidade familiar pessoa concluída com sucesso")
-        else:
-            print("❌ Erro na análise de unidade familiar pessoa")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de pessoa: {e}")
-        return False
-    
-    # Executar análise de endereços
-    print("\n" + "="*80)
-    print("📍 FASE 3: ANÁLISE ENDEREÇOS")
-    print("="*80)
-    
-    try:
-        if limit:
-            result3 = subprocess.run([
-                'python', 'run_caf_analysis_endereco.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result3 = subprocess.run([
-                'python', 'run_caf_analysis_endereco.py'
-            ], capture_output=False, text=True)
-        
-        if result3.returncode == 0:
-            print("✅ Análise de endereços concluída com sucesso")
-        else:
-            print("❌ Erro na análise de endereços")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de endereços: {e}")
-        return False
-    
-    # Executar análise de área imóvel
-    print("\n" + "="*80)
-    print("🏠 FASE 4: ANÁLISE ÁREA IMÓVEL")
-    print("="*80)
-    
-    try:
-        if limit:
-            result4 = subprocess.run([
-                'python', 'run_caf_analysis_area_imovel.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result4 = subprocess.run([
-                'python', 'run_caf_analysis_area_imovel.py'
-            ], capture_output=False, text=True)
-        
-        if result4.returncode == 0:
-            print("✅ Análise de área imóvel concluída com sucesso")
-        else:
-            print("❌ Erro na análise de área imóvel")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de área imóvel: {e}")
-        return False
-    
-    # Executar análise de renda
-    print("\n" + "="*80)
-    print("💰 FASE 5: ANÁLISE RENDA")
-    print("="*80)
-    
-    try:
-        if limit:
-            result5 = subprocess.run([
-                'python', 'run_caf_analysis_renda.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result5 = subprocess.run([
-                'python', 'run_caf_analysis_renda.py'
-            ], capture_output=False, text=True)
-        
-        if result5.returncode == 0:
-            print("✅ Análise de renda concluída com sucesso")
-        else:
-            print("❌ Erro na análise de renda")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de renda: {e}")
-        return False
-    
-    # Executar análise de funcionário UFPR
-    print("\n" + "="*80)
-    print("👤 FASE 6: ANÁLISE FUNCIONÁRIO UFPR")
-    print("="*80)
-    
-    try:
-        if limit:
-            result6 = subprocess.run([
-                'python', 'run_caf_analysis_funcionario_ufpr.py', str(limit)
-            ], capture_output=False, text=True)
-        else:
-            result6 = subprocess.run([
-                'python', 'run_caf_analysis_funcionario_ufpr.py'
-            ], capture_output=False, text=True)
-        
-        if result6.returncode == 0:
-            print("✅ Análise de funcionário UFPR concluída com sucesso")
-        else:
-            print("❌ Erro na análise de funcionário UFPR")
-            return False
+    sys.stdout.flush()
+    
+    # "spawn" para cada fase iniciar com conexões próprias; os workers do
+    # ProcessPoolExecutor não são daemon e podem criar seus próprios pools.
+    # As fases começam na ordem de ANALYSIS_PHASES, sua saída chega prefixada com
+    # "[FASE N]" enquanto rodam e o resumo segue a mesma ordem
+    failed = []
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=PHASE_WORKERS, mp_context=context) as executor:
+        futures = [
+            (number, title, executor.submit(
+                _run_analysis_phase, number, title, module_name, function_name, accepts_limit, limit
+            ))
+            for number, (title, module_name, function_name, accepts_limit) in enumerate(ANALYSIS_PHASES, 1)
+        ]
+        for number, title, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                # Falha do próprio worker (ex.: processo encerrado)
+                print(f"❌ FASE {number}: erro na análise {title}: {e}")
+                failed.append(title)
+                continue
             
-    except Exception as e:
-        print(f"❌ Erro ao executar análise de funcionário UFPR: {e}")
+            if result['error']:
+                print(result['error'], end='')
+                print(f"❌ FASE {number}: erro na análise {title} ({result['elapsed']:.1f}s)")
+                failed.append(title)
+            else:
+                print(f"✅ FASE {number}: análise {title} concluída com sucesso ({result['elapsed']:.1f}s)")
+    
+    if failed:
         return False
     
     # Relatório final
@@ -174,23 +155,9 @@ def run_unified_analysis(limit: int = None):
     print("="*80)
     
     try:
-        print("\n📊 RESUMO UNIDADE FAMILIAR:")
-        subprocess.run(['python', 'verify_updates.py'], capture_output=False)
-        
-        print("\n👥 RESUMO UNIDADE FAMILIAR PESSOA:")
-        subprocess.run(['python', 'verify_pessoa_updates.py'], capture_output=False)
-        
-        print("\n📍 RESUMO ENDEREÇOS:")
-        subprocess.run(['python', 'verify_endereco_updates.py'], capture_output=False)
-        
-        print("\n🏠 RESUMO ÁREA IMÓVEL:")
-        subprocess.run(['python', 'verify_area_imovel_updates.py'], capture_output=False)
-        
-        print("\n💰 RESUMO RENDA:")
-        subprocess.run(['python', 'verify_renda_updates.py'], capture_output=False)
-        
-        print("\n👤 RESUMO FUNCIONÁRIO UFPR:")
-        subprocess.run(['python', 'verify_funcionario_ufpr_updates.py'], capture_output=False)
+        for title, module_name, function_name in REPORT_PHASES:
+            print(f"\n{title}")
+            _run_phase(module_name, function_name, False)
         
     except Exception as e:
         print(f"⚠️  Erro ao gerar relatório: {e}")
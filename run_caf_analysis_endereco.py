@@ -7,10 +7,15 @@ Implementa as mesmas regras da análise unidade_familiar:
 3. Mapeamento baseado no arquivo de_para_endereco.csv
 """
 
+import atexit
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import RealDictCursor, register_uuid
 import pymongo
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
@@ -30,48 +35,87 @@ MONGODB_CONFIG = {
     'collection': 'caf_endereco'
 }
 
+# Linhas trazidas por ida ao servidor no cursor nomeado da detecção
+STREAM_ITERSIZE = 10000
+
+# Tamanho dos lotes de leitura ($in) e escrita (bulk_write) no MongoDB
+MONGO_BULK_BATCH_SIZE = 1000
+
+# Colunas de S_ENDERECO usadas por build_mapped_endereco_document
+# (cd_municipio vem de S_MUNICIPIO, como no e.* sobrescrito pelo JOIN)
+ENDERECO_DOCUMENT_COLUMNS = [
+    'id_endereco', 'sg_uf', 'nr_cep', 'ds_logradouro', 'ds_complemento',
+    'nr_logradouro', 'ds_referencia', 'dt_atualizacao'
+]
+
+# Campos de auditoria e controle ignorados na comparação de versões
+ENDERECO_COMPARISON_IGNORE_FIELDS = frozenset({
+    '_id',
+    'dataAtualizacao',
+    '_versao',
+    '_versao_anterior',
+    '_schema_origem',
+    '_timestamp_versao'
+})
+
+# Índices das consultas de versionamento (schema processado e última versão)
+ENDERECO_INDEXES = [
+    [('idEndereco', 1), ('_schema_origem', 1)],
+    [('idEndereco', 1), ('_versao', -1)]
+]
+
+# Pares de schemas analisados em paralelo (uma conexão do pool por par);
+# também limita quantos pares têm alterações aguardando gravação
+PAIR_WORKERS = 4
+
+# Pool de conexões PostgreSQL (criado sob demanda em get_pg_pool)
+_pg_pool = None
+
+# Cliente MongoDB compartilhado (criado sob demanda em get_mongo_client)
+_mongo_client = None
+
 class CAFEnderecoFieldMapper:
     """Mapeia campos entre PostgreSQL e MongoDB para endereços"""
     
     def __init__(self):
         self.mapping = self.load_field_mapping()
+        # Índice reverso campo Postgres -> campo Mongo (primeira ocorrência no CSV)
+        self._by_pg = {}
+        for mongo_field, mapping in self.mapping.items():
+            if mapping['postgres_field'] is not None:
+                self._by_pg.setdefault(mapping['postgres_field'], mongo_field)
+        self._fields_by_table = {}
     
     def load_field_mapping(self) -> Dict[str, Dict]:
         """Carrega mapeamento de campos do arquivo CSV"""
         try:
-            df = pd.read_csv('de_para_endereco.csv')
+            # Colunas: Campo (Mongo), Tabela (Postgres), Campo (Postgres);
+            # as duas primeiras linhas são título e cabeçalho
+            df = pd.read_csv(
+                'de_para_endereco.csv',
+                header=None,
+                skiprows=2,
+                usecols=[0, 2, 3],
+                names=['mongo', 'tbl', 'pg'],
+                dtype='string'
+            )
             
-            # Limpar e processar dados
-            mapping = {}
+            # Limpar espaços em branco
+            df = df.apply(lambda column: column.str.strip())
             
-            for _, row in df.iterrows():
-                mongo_field = row.iloc[0]  # Campo Mongo
-                postgres_table = row.iloc[2]  # Tabela Postgres
-                postgres_field = row.iloc[3]  # Campo Postgres
-                
-                # Pular linhas vazias ou cabeçalhos
-                if pd.isna(mongo_field) or mongo_field in ['Campo (Mongo)', '']:
-                    continue
-                
-                # Pular campos técnicos
-                if mongo_field in ['_id']:
-                    continue
-                
-                # Pular campos que não se aplicam
-                if pd.isna(postgres_table) or postgres_table == 'Não se aplica':
-                    continue
-                
-                # Limpar espaços em branco
-                mongo_field = str(mongo_field).strip()
-                postgres_table = str(postgres_table).strip()
-                postgres_field = str(postgres_field).strip()
-                
-                mapping[mongo_field] = {
-                    'postgres_table': postgres_table,
-                    'postgres_field': postgres_field,
-                    'is_object': '.' in mongo_field,
-                    'parent_field': mongo_field.split('.')[0] if '.' in mongo_field else None
+            # Pular linhas vazias, campos técnicos e campos que não se aplicam
+            df = df.dropna(subset=['mongo', 'tbl'])
+            df = df[(df['mongo'] != '') & (df['mongo'] != '_id') & (df['tbl'] != 'Não se aplica')]
+            
+            mapping = {
+                row.mongo: {
+                    'postgres_table': row.tbl,
+                    'postgres_field': None if pd.isna(row.pg) else row.pg,
+                    'is_object': '.' in row.mongo,
+                    'parent_field': row.mongo.split('.')[0] if '.' in row.mongo else None
                 }
+                for row in df.itertuples(index=False)
+            }
             
             print(f"✅ Carregado mapeamento de {len(mapping)} campos para endereços")
             return mapping
@@ -81,16 +125,49 @@ class CAFEnderecoFieldMapper:
             return {}
     
     def get_postgres_fields_for_table(self, table_name: str) -> List[str]:
-        """Retorna lista de campos PostgreSQL para uma tabela específica"""
-        fields = []
-        for mongo_field, mapping in self.mapping.items():
-            if mapping['postgres_table'] == table_name and not pd.isna(mapping['postgres_field']):
-                fields.append(mapping['postgres_field'])
-        return list(set(fields))
+        """Retorna lista de campos PostgreSQL para uma tabela específica (memoizada)"""
+        if table_name not in self._fields_by_table:
+            self._fields_by_table[table_name] = list(dict.fromkeys(
+                mapping['postgres_field']
+                for mapping in self.mapping.values()
+                if mapping['postgres_table'] == table_name and mapping['postgres_field'] is not None
+            ))
+        return self._fields_by_table[table_name]
+
+def get_pg_pool() -> pg_pool.ThreadedConnectionPool:
+    """Retorna o pool de conexões PostgreSQL compartilhado pela execução"""
+    global _pg_pool
+    if _pg_pool is None:
+        _pg_pool = pg_pool.ThreadedConnectionPool(1, 8, **POSTGRES_CONFIG)
+        atexit.register(_pg_pool.closeall)
+    return _pg_pool
+
+def get_pg_connection():
+    """
+    Empresta uma conexão do pool. Colunas uuid chegam como uuid.UUID
+    (registro por conexão, sem afetar outros módulos no mesmo processo)
+    """
+    conn = get_pg_pool().getconn()
+    register_uuid(conn_or_curs=conn)
+    return conn
+
+def release_pg_connection(conn) -> None:
+    """Devolve a conexão ao pool, encerrando qualquer transação aberta"""
+    if not conn.closed:
+        conn.rollback()
+    get_pg_pool().putconn(conn)
+
+def get_mongo_client() -> pymongo.MongoClient:
+    """Retorna o MongoClient compartilhado por toda a execução"""
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = pymongo.MongoClient(MONGODB_CONFIG['connection_string'])
+        atexit.register(_mongo_client.close)
+    return _mongo_client
 
 def get_caf_schemas() -> List[str]:
     """Obtém lista de schemas CAF ordenados por data"""
-    conn = psycopg2.connect(**POSTGRES_CONFIG)
+    conn = get_pg_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -103,7 +180,7 @@ def get_caf_schemas() -> List[str]:
     
     schemas = [row[0] for row in cursor.fetchall()]
     cursor.close()
-    conn.close()
+    release_pg_connection(conn)
     return schemas
 
 def get_endereco_changes(schema1: str, schema2: str, mapper: CAFEnderecoFieldMapper, limit: int = None) -> List[Dict]:
@@ -114,53 +191,100 @@ def get_endereco_changes(schema1: str, schema2: str, mapper: CAFEnderecoFieldMap
     
     print(f"   🔍 Analisando endereços entre {schema1} e {schema2}...")
     
-    conn = psycopg2.connect(**POSTGRES_CONFIG)
+    conn = get_pg_connection()
     cursor = conn.cursor()
     
-    # Query para detectar IDs dos endereços que mudaram
-    query = f"""
-    SELECT 
-        COALESCE(t1."id_endereco", t2."id_endereco") as id_endereco,
-        CASE 
-            WHEN t1."id_endereco" IS NULL THEN 'INSERT'
-            WHEN t2."id_endereco" IS NULL THEN 'DELETE'
-            ELSE 'UPDATE'
-        END as change_type
-    FROM "{schema1}"."S_ENDERECO" t1
-    FULL OUTER JOIN "{schema2}"."S_ENDERECO" t2 
-        ON t1."id_endereco" = t2."id_endereco"
-    WHERE 
-        t1."id_endereco" IS NULL OR 
-        t2."id_endereco" IS NULL OR
-        t1."dt_atualizacao" IS DISTINCT FROM t2."dt_atualizacao"
-    ORDER BY COALESCE(t1."id_endereco", t2."id_endereco")
-    """
-    
-    # Adicionar limite se especificado
-    if limit:
-        query += f" LIMIT {limit}"
-    
     try:
-        cursor.execute(query)
-        results = cursor.fetchall()
+        # (campo, campo Mongo) comparados, calculados uma vez
+        compared_fields = []
+        for field in mapper.get_postgres_fields_for_table('S_ENDERECO'):
+            if field in ['dt_criacao', 'dt_atualizacao']:  # Ignorar campos de auditoria
+                continue
+            mongo_field = get_mongo_field_name(field, mapper)
+            if mongo_field:
+                compared_fields.append((field, mongo_field))
         
+        # Comparação campo a campo feita no PostgreSQL: cada linha traz
+        # chave, id antigo, id novo e, por campo, (mudou, valor antigo,
+        # valor novo), com os valores só quando o campo mudou
+        select_clause = get_endereco_diff_select_clause(
+            compared_fields,
+            set(get_endereco_columns(cursor, schema1)),
+            set(get_endereco_columns(cursor, schema2))
+        )
+        
+        # Uma única query traz as duas versões de cada endereço alterado.
+        # Em vez de FULL OUTER JOIN (merge ordenado sobre as duas tabelas
+        # inteiras), dois ramos: UPDATE por INNER JOIN com o filtro de
+        # dt_atualizacao empurrado para o join e INSERT por anti-join.
+        # Remoções não geram versão e por isso não são consultadas
+        query = f"""
+        SELECT t1."id_endereco" AS chave, {select_clause}
+        FROM "{schema1}"."S_ENDERECO" t1
+        INNER JOIN "{schema2}"."S_ENDERECO" t2 
+            ON t1."id_endereco" = t2."id_endereco"
+        WHERE t1."dt_atualizacao" IS DISTINCT FROM t2."dt_atualizacao"
+        UNION ALL
+        SELECT t2."id_endereco" AS chave, {select_clause}
+        FROM "{schema2}"."S_ENDERECO" t2
+        LEFT JOIN "{schema1}"."S_ENDERECO" t1 
+            ON t1."id_endereco" = t2."id_endereco"
+        WHERE t1."id_endereco" IS NULL
+        """
+        
+        # Adicionar limite se especificado. A ordenação só é necessária para
+        # o limite ser determinístico; sem ele o resultado segue sem Sort
+        if limit:
+            query += f" ORDER BY chave LIMIT {limit}"
+        
+        # Cursor nomeado (server-side) para ler o resultado em lotes
+        stream = conn.cursor(name='endereco_diff')
+        stream.itersize = STREAM_ITERSIZE
+        stream.execute(query)
+        
+        # Um único instante de detecção para todo o par de schemas
+        detected_at = datetime.now(timezone.utc)
         changes = []
-        for row in results:
-            endereco_id, change_type = row
+        for row in stream:
+            old_id = row[1]
+            new_id = row[2]
             
-            # Para cada ID, detectar que campos mudaram
-            changed_fields = detect_endereco_field_changes(str(endereco_id), schema1, schema2, mapper, cursor)
+            if old_id is not None and new_id is not None:
+                # Ambos existem - apenas os campos sinalizados pelo PostgreSQL
+                changed_fields = []
+                for position, (field, mongo_field) in enumerate(compared_fields):
+                    base = 3 + 3 * position
+                    if row[base]:
+                        old_value = row[base + 1]
+                        new_value = row[base + 2]
+                        changed_fields.append({
+                            'mongo_field': mongo_field,
+                            'postgres_field': field,
+                            'old_value': str(old_value) if old_value is not None else None,
+                            'new_value': str(new_value) if new_value is not None else None
+                        })
+                change_type = 'UPDATE'
+            else:
+                # Inserção - todos os campos
+                changed_fields = [{
+                    'mongo_field': 'ALL',
+                    'postgres_field': 'ALL',
+                    'old_value': None,
+                    'new_value': 'NEW_RECORD'
+                }]
+                change_type = 'INSERT'
             
             if changed_fields:
                 change_record = {
-                    'endereco_id': str(endereco_id),
+                    'endereco_id': old_id if old_id is not None else new_id,
                     'change_type': change_type,
                     'schema_from': schema1,
                     'schema_to': schema2,
                     'changed_fields': changed_fields,
-                    'timestamp': datetime.utcnow()
+                    'timestamp': detected_at
                 }
                 changes.append(change_record)
+        stream.close()
         
         print(f"      ✅ {len(changes)} endereços com alterações detectadas")
         
@@ -169,92 +293,104 @@ def get_endereco_changes(schema1: str, schema2: str, mapper: CAFEnderecoFieldMap
         changes = []
     
     cursor.close()
-    conn.close()
+    release_pg_connection(conn)
     return changes
 
-def detect_endereco_field_changes(endereco_id: str, schema1: str, schema2: str, mapper: CAFEnderecoFieldMapper, cursor) -> List[str]:
-    """Detecta alterações específicas em campos para um endereço"""
+def get_endereco_diff_select_clause(compared_fields: List[Tuple[str, str]], old_columns: set, new_columns: set) -> str:
+    """
+    Lista do SELECT da detecção: ids de t1 e t2 e, para cada campo
+    comparado, o indicador IS DISTINCT FROM e os dois valores (NULL quando
+    iguais). Campo ausente em um dos schemas vale NULL nesse lado
+    """
+    
+    expressions = ['t1."id_endereco"', 't2."id_endereco"']
+    for field, _ in compared_fields:
+        old_expr = f't1."{field}"' if field in old_columns else 'NULL'
+        new_expr = f't2."{field}"' if field in new_columns else 'NULL'
+        changed = f'({old_expr} IS DISTINCT FROM {new_expr})'
+        expressions.append(changed)
+        expressions.append(f'CASE WHEN {changed} THEN {old_expr} END')
+        expressions.append(f'CASE WHEN {changed} THEN {new_expr} END')
+    
+    return ', '.join(expressions)
+
+def get_endereco_document_select_clause(columns: set) -> str:
+    """
+    Lista de ENDERECO_DOCUMENT_COLUMNS para o SELECT dos documentos.
+    Coluna ausente no schema (dumps antigos) vale NULL
+    """
+    return ', '.join(
+        f'e."{column}"' if column in columns else f'NULL AS "{column}"'
+        for column in ENDERECO_DOCUMENT_COLUMNS
+    )
+
+def get_endereco_columns(cursor, schema: str) -> List[str]:
+    """Colunas de S_ENDERECO no schema, na ordem de SELECT *"""
+    cursor.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = 'S_ENDERECO'
+        ORDER BY ordinal_position
+    """, (schema,))
+    return [row[0] for row in cursor.fetchall()]
+
+def ensure_endereco_id_index(conn, schemas: List[str]) -> None:
+    """
+    Garante índice em id_endereco nos schemas comparados, usado pelos
+    joins e anti-joins da detecção. Se a chave primária já cobre a coluna,
+    nada é criado
+    """
+    
+    cursor = conn.cursor()
     
     try:
-        # Buscar dados do endereço em ambos os schemas
-        cursor.execute(f"""
-            SELECT * FROM "{schema1}"."S_ENDERECO" 
-            WHERE "id_endereco" = %s
-        """, (endereco_id,))
-        
-        old_data = cursor.fetchone()
-        old_columns = [desc[0] for desc in cursor.description] if old_data else []
-        
-        cursor.execute(f"""
-            SELECT * FROM "{schema2}"."S_ENDERECO" 
-            WHERE "id_endereco" = %s
-        """, (endereco_id,))
-        
-        new_data = cursor.fetchone()
-        new_columns = [desc[0] for desc in cursor.description] if new_data else []
-        
-        changed_fields = []
-        
-        if old_data and new_data:
-            # Ambos existem - verificar diferenças
-            old_dict = dict(zip(old_columns, old_data))
-            new_dict = dict(zip(new_columns, new_data))
-            
-            # Verificar cada campo mapeado
-            endereco_fields = mapper.get_postgres_fields_for_table('S_ENDERECO')
-            
-            for field in endereco_fields:
-                if field in ['dt_criacao', 'dt_atualizacao']:  # Ignorar campos de auditoria
+        for schema in schemas:
+            # Falha em um schema não impede a criação nos demais
+            try:
+                cursor.execute("""
+                    SELECT 1
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indrelid
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = i.indkey[0]
+                    WHERE n.nspname = %s AND c.relname = 'S_ENDERECO'
+                      AND a.attname = 'id_endereco'
+                """, (schema,))
+                if cursor.fetchone():
+                    conn.commit()
                     continue
                 
-                old_value = old_dict.get(field)
-                new_value = new_dict.get(field)
-                
-                if old_value != new_value:
-                    mongo_field = get_mongo_field_name(field, mapper)
-                    if mongo_field:
-                        changed_fields.append({
-                            'mongo_field': mongo_field,
-                            'postgres_field': field,
-                            'old_value': str(old_value) if old_value is not None else None,
-                            'new_value': str(new_value) if new_value is not None else None
-                        })
-        
-        elif new_data and not old_data:
-            # Inserção - todos os campos
-            changed_fields.append({
-                'mongo_field': 'ALL',
-                'postgres_field': 'ALL',
-                'old_value': None,
-                'new_value': 'NEW_RECORD'
-            })
-        
-        return changed_fields
-        
-    except Exception as e:
-        print(f"        ⚠️  Erro ao detectar mudanças para {endereco_id}: {e}")
-        return []
+                cursor.execute(f"""
+                    CREATE INDEX IF NOT EXISTS "ix_endereco_id"
+                    ON "{schema}"."S_ENDERECO" ("id_endereco")
+                """)
+                cursor.execute(f'ANALYZE "{schema}"."S_ENDERECO"')
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"      ⚠️  Não foi possível criar índice de endereço em {schema}: {e}")
+    finally:
+        cursor.close()
 
 def get_mongo_field_name(postgres_field: str, mapper: CAFEnderecoFieldMapper) -> Optional[str]:
     """Encontra o nome do campo MongoDB correspondente ao campo PostgreSQL"""
-    
-    for mongo_field, mapping in mapper.mapping.items():
-        if mapping['postgres_field'] == postgres_field:
-            return mongo_field
-    
-    return None
+    return mapper._by_pg.get(postgres_field)
 
-def build_complete_endereco_document(endereco_id: str, schema: str, mapper: CAFEnderecoFieldMapper) -> Optional[Dict]:
-    """Constrói documento completo do endereço usando o mapeamento"""
+def build_complete_endereco_documents(endereco_ids: List[Any], schema: str, mapper: CAFEnderecoFieldMapper, cursor, columns: set) -> Dict[Any, Dict]:
+    """
+    Constrói os documentos completos de um lote de endereços usando o
+    mapeamento. Uma única query (ANY) no cursor do chamador (RealDictCursor),
+    projetada sobre as colunas de S_ENDERECO do schema; retorna
+    {id_endereco: documento}
+    """
     
-    conn = psycopg2.connect(**POSTGRES_CONFIG)
-    cursor = conn.cursor()
+    documents = {}
     
     try:
         # Query principal para endereço com JOINs
         cursor.execute(f"""
             SELECT 
-                e.*,
+                {get_endereco_document_select_clause(columns)},
                 eup.id_unidade_familiar,
                 m.cd_municipio, m.nm_municipio, m.cd_uf, m.sg_uf as municipio_uf
             FROM "{schema}"."S_ENDERECO" e
@@ -262,39 +398,33 @@ def build_complete_endereco_document(endereco_id: str, schema: str, mapper: CAFE
                 ON e.id_endereco = eup.id_endereco
             LEFT JOIN "{schema}"."S_MUNICIPIO" m 
                 ON e.cd_municipio = m.cd_municipio
-            WHERE e.id_endereco = %s
-        """, (endereco_id,))
-        
-        result = cursor.fetchone()
-        if not result:
-            return None
-        
-        columns = [desc[0] for desc in cursor.description]
-        data = dict(zip(columns, result))
+            WHERE e.id_endereco = ANY(%s::uuid[])
+        """, (endereco_ids,))
         
-        # Construir documento usando mapeamento
-        document = build_mapped_endereco_document(data, mapper)
-        
-        return document
+        for data in cursor.fetchall():
+            endereco_id = data.get('id_endereco')
+            
+            # Mesmo critério da busca individual: primeira linha de cada endereço
+            if endereco_id not in documents:
+                documents[endereco_id] = build_mapped_endereco_document(data, mapper)
         
     except Exception as e:
-        print(f"      ❌ Erro ao buscar dados completos do endereço: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+        cursor.connection.rollback()
+        print(f"      ❌ Erro ao buscar dados completos dos endereços: {e}")
+    
+    return documents
 
 def build_mapped_endereco_document(data: Dict, mapper: CAFEnderecoFieldMapper) -> Dict:
     """Constrói documento MongoDB baseado no mapeamento"""
     
+    id_unidade_familiar = data.get('id_unidade_familiar')
+    
+    # Documento montado num único literal: cada coluna é lida uma vez
     document = {
         '_versao': 1,  # Será sobrescrito na função save_changes_to_mongodb
         'idEndereco': str(data.get('id_endereco')),
-        'idUnidadeFamiliar': str(data.get('id_unidade_familiar')) if data.get('id_unidade_familiar') else None,
-    }
-    
-    # Mapear campos diretos do endereço
-    direct_mappings = {
+        'idUnidadeFamiliar': str(id_unidade_familiar) if id_unidade_familiar else None,
+        # Campos diretos do endereço
         'uf': data.get('sg_uf'),
         'cep': data.get('nr_cep'),
         'logradouro': data.get('ds_logradouro'),
@@ -304,13 +434,12 @@ def build_mapped_endereco_document(data: Dict, mapper: CAFEnderecoFieldMapper) -
         'dataAtualizacao': convert_date(data.get('dt_atualizacao'), with_time=True),
     }
     
-    document.update(direct_mappings)
-    
     # Município
-    if data.get('cd_municipio'):
-        document['codigoMunicipio'] = data.get('cd_municipio')
+    cd_municipio = data.get('cd_municipio')
+    if cd_municipio:
+        document['codigoMunicipio'] = cd_municipio
         document['municipio'] = {
-            'codigo': data.get('cd_municipio'),
+            'codigo': cd_municipio,
             'nome': data.get('nm_municipio'),
             'codigoUf': data.get('cd_uf'),
             'siglaUf': data.get('municipio_uf')
@@ -337,67 +466,111 @@ def save_endereco_changes_to_mongodb(changes: List[Dict], mapper: CAFEnderecoFie
         return True, 0
     
     try:
-        client = pymongo.MongoClient(MONGODB_CONFIG['connection_string'])
-        db = client[MONGODB_CONFIG['database']]
+        db = get_mongo_client()[MONGODB_CONFIG['database']]
         collection = db[MONGODB_CONFIG['collection']]
         
+        for index in ENDERECO_INDEXES:
+            collection.create_index(index)
+        
         inserted_count = 0
         updated_count = 0
         ignored_count = 0
         
+        # Estado atual de todos os endereços alterados, carregado em lotes:
+        # versão mais recente e schemas já processados. No MongoDB o id é
+        # texto; o uuid nativo só é convertido nesta fronteira
+        endereco_ids = list({str(change['endereco_id']) for change in changes})
+        latest_by_id = {}
+        schemas_by_id = {}
+        for start in range(0, len(endereco_ids), MONGO_BULK_BATCH_SIZE):
+            batch_ids = endereco_ids[start:start + MONGO_BULK_BATCH_SIZE]
+            for state in collection.aggregate([
+                {'$match': {'idEndereco': {'$in': batch_ids}}},
+                {'$sort': {'_versao': -1}},
+                {'$group': {
+                    '_id': '$idEndereco',
+                    'latest': {'$first': '$$ROOT'},
+                    'schemas': {'$addToSet': '$_schema_origem'}
+                }}
+            ]):
+                latest_by_id[state['_id']] = state['latest']
+                schemas_by_id[state['_id']] = set(state['schemas'])
+        
+        # Endereços ainda não processados, agrupados pelo schema de destino
+        ids_by_schema = {}
+        for change in changes:
+            if change['schema_to'] not in schemas_by_id.get(str(change['endereco_id']), ()):
+                ids_by_schema.setdefault(change['schema_to'], []).append(change['endereco_id'])
+        
+        # Construir documentos completos em lotes, numa conexão do pool
+        documents = {}
+        conn = get_pg_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            for schema, ids in ids_by_schema.items():
+                with conn.cursor() as columns_cursor:
+                    columns = set(get_endereco_columns(columns_cursor, schema))
+                for start in range(0, len(ids), MONGO_BULK_BATCH_SIZE):
+                    batch = build_complete_endereco_documents(
+                        ids[start:start + MONGO_BULK_BATCH_SIZE], schema, mapper,
+                        cursor, columns
+                    )
+                    for endereco_id, document in batch.items():
+                        documents[(endereco_id, schema)] = document
+            cursor.close()
+        finally:
+            release_pg_connection(conn)
+        
+        # Um único instante de versionamento para todo o lote
+        versioned_at = datetime.now(timezone.utc)
+        operations = []
         for change in changes:
             endereco_id = change['endereco_id']
+            mongo_id = str(endereco_id)
             schema = change['schema_to']
             
             # Verificar se já foi processado para este schema
-            existing_doc = collection.find_one({
-                'idEndereco': endereco_id,
-                '_schema_origem': schema
-            })
-            
-            if existing_doc:
+            if schema in schemas_by_id.get(mongo_id, ()):
                 ignored_count += 1
                 continue
             
-            # Construir documento completo
-            new_document = build_complete_endereco_document(endereco_id, schema, mapper)
+            # Documento completo
+            new_document = documents.get((endereco_id, schema))
             
             if new_document:
-                # Buscar a versão mais recente existente
-                latest_doc = collection.find_one(
-                    {'idEndereco': endereco_id},
-                    sort=[('_versao', -1)]
-                )
+                # Versão mais recente existente
+                latest_doc = latest_by_id.get(mongo_id)
                 
                 if latest_doc:
                     # Verificar se houve mudança real
-                    if endereco_documents_are_different(latest_doc, new_document):
-                        # Criar nova versão
-                        new_version = latest_doc.get('_versao', 1) + 1
-                        new_document['_versao'] = new_version
-                        new_document['_versao_anterior'] = latest_doc.get('_versao', 1)
-                        new_document['_schema_origem'] = schema
-                        new_document['_timestamp_versao'] = datetime.utcnow()
-                        
-                        result = collection.insert_one(new_document)
-                        if result.inserted_id:
-                            updated_count += 1
-                        else:
-                            ignored_count += 1
-                    else:
+                    if not endereco_documents_are_different(latest_doc, new_document):
                         ignored_count += 1
+                        continue
+                    
+                    # Criar nova versão
+                    new_version = latest_doc.get('_versao', 1) + 1
+                    new_document['_versao'] = new_version
+                    new_document['_versao_anterior'] = latest_doc.get('_versao', 1)
+                    updated_count += 1
                 else:
                     # Primeira versão do documento
                     new_document['_versao'] = 1
                     new_document['_versao_anterior'] = None
-                    new_document['_schema_origem'] = schema
-                    new_document['_timestamp_versao'] = datetime.utcnow()
-                    
-                    result = collection.insert_one(new_document)
-                    if result.inserted_id:
-                        inserted_count += 1
-                    else:
-                        ignored_count += 1
+                    inserted_count += 1
+                
+                new_document['_schema_origem'] = schema
+                new_document['_timestamp_versao'] = versioned_at
+                
+                operations.append(pymongo.InsertOne(new_document))
+                latest_by_id[mongo_id] = new_document
+                schemas_by_id.setdefault(mongo_id, set()).add(schema)
+                
+                if len(operations) >= MONGO_BULK_BATCH_SIZE:
+                    collection.bulk_write(operations, ordered=False)
+                    operations = []
+        
+        if operations:
+            collection.bulk_write(operations, ordered=False)
         
         # Relatório
         total_processed = inserted_count + updated_count + ignored_count
@@ -412,7 +585,6 @@ def save_endereco_changes_to_mongodb(changes: List[Dict], mapper: CAFEnderecoFie
             if ignored_count > 0:
                 print(f"      ⏭️  {ignored_count} endereços IGNORADOS (sem alteração ou já processados)")
         
-        client.close()
         return True, actual_changes
         
     except Exception as e:
@@ -422,30 +594,18 @@ def save_endereco_changes_to_mongodb(changes: List[Dict], mapper: CAFEnderecoFie
         return False, 0
 
 def endereco_documents_are_different(doc1: Dict, doc2: Dict) -> bool:
-    """Compara documentos ignorando campos de auditoria e controle"""
-    
-    # Campos a ignorar na comparação
-    ignore_fields = {
-        '_id', 
-        'dataAtualizacao',
-        '_versao',
-        '_versao_anterior', 
-        '_schema_origem', 
-        '_timestamp_versao'
-    }
-    
-    def clean_doc(doc):
-        if isinstance(doc, dict):
-            return {k: clean_doc(v) for k, v in doc.items() if k not in ignore_fields}
-        elif isinstance(doc, list):
-            return [clean_doc(item) for item in doc]
-        else:
-            return doc
+    """
+    Compara documentos ignorando campos de auditoria e controle.
+    Os campos ignorados só existem na raiz do documento, então basta
+    filtrar as chaves de primeiro nível, sem copiar os documentos
+    """
     
-    clean_doc1 = clean_doc(doc1)
-    clean_doc2 = clean_doc(doc2)
+    keys1 = doc1.keys() - ENDERECO_COMPARISON_IGNORE_FIELDS
+    keys2 = doc2.keys() - ENDERECO_COMPARISON_IGNORE_FIELDS
+    if keys1 != keys2:
+        return True
     
-    return clean_doc1 != clean_doc2
+    return any(doc1[key] != doc2[key] for key in keys1)
 
 def run_incremental_endereco_analysis(limit: int = None):
     """Executa análise incremental para endereços"""
@@ -476,20 +636,39 @@ def run_incremental_endereco_analysis(limit: int = None):
     
     total_changes = 0
     
-    for i in range(len(schemas) - 1):
-        schema1 = schemas[i]
-        schema2 = schemas[i + 1]
-        
-        print(f"\n🔄 Comparando {schema1} → {schema2}")
-        
-        # Analisar alterações com limite
-        changes = get_endereco_changes(schema1, schema2, mapper, limit)
+    # Índices de id_endereco criados uma única vez, antes dos workers: pares
+    # vizinhos compartilham schemas e disputariam o mesmo CREATE INDEX
+    conn = get_pg_connection()
+    try:
+        ensure_endereco_id_index(conn, schemas)
+    finally:
+        release_pg_connection(conn)
+    
+    # A detecção (somente PostgreSQL) roda em paralelo, com no máximo
+    # PAIR_WORKERS pares à frente da gravação; a gravação segue a ordem dos
+    # schemas, pois cada versão no MongoDB depende da gravada pelo par anterior
+    pairs = list(zip(schemas, schemas[1:]))
+    with ThreadPoolExecutor(max_workers=PAIR_WORKERS) as executor:
+        pending = deque()
+        next_pair = 0
         
-        if changes:
-            # Salvar no MongoDB e obter número real de documentos processados
-            success, actual_changes = save_endereco_changes_to_mongodb(changes, mapper)
-            if success:
-                total_changes += actual_changes
+        for schema1, schema2 in pairs:
+            while next_pair < len(pairs) and len(pending) < PAIR_WORKERS:
+                pending.append(executor.submit(
+                    get_endereco_changes, *pairs[next_pair], mapper, limit
+                ))
+                next_pair += 1
+            
+            # Analisar alterações com limite
+            changes = pending.popleft().result()
+            
+            print(f"\n🔄 Comparando {schema1} → {schema2}")
+            
+            if changes:
+                # Salvar no MongoDB e obter número real de documentos processados
+                success, actual_changes = save_endereco_changes_to_mongodb(changes, mapper)
+                if success:
+                    total_changes += actual_changes
     
     print(f"\n🎉 Análise de endereços concluída!")
     print(f"📈 Total de endereços EFETIVAMENTE SALVOS: {total_changes:,}")
@@ -9,13 +9,14 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 import psycopg2
+from psycopg2.extras import RealDictCursor
 import pymongo
 from pymongo import MongoClient
 import pandas as pd
 from datetime import datetime, timezone
 import uuid
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 import json
 
 # Configurar logging
@@ -56,6 +57,53 @@ FIELD_MAPPING = {
     'pessoaFisica.sexo.nome': 'nm_sexo'
 }
 
+# Colunas do PostgreSQL comparadas entre períodos (campos mapeados, sem repetição)
+COMPARED_COLUMNS = tuple(dict.fromkeys(FIELD_MAPPING.values()))
+
+# Colunas que convert_to_mongo_format grava como None quando vazias ('' ou NULL)
+EMPTY_AS_NONE_COLUMNS = frozenset({'nm_sexo'})
+
+# Linhas trazidas por ida ao servidor nos cursores nomeados
+STREAM_ITERSIZE = 10000
+
+# Tamanho dos lotes de escrita (bulk_write) no MongoDB
+MONGO_BULK_BATCH_SIZE = 1000
+
+def merge_rows_by_id(old_rows: Iterator[Dict[str, Any]], new_rows: Iterator[Dict[str, Any]],
+                     id_field: str) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+    """
+    Percorre em paralelo duas sequências de linhas ordenadas pelo id (como
+    str) e produz pares (antiga, nova). Id presente em só um dos lados gera
+    o par com None no outro lado. Apenas uma linha de cada lado fica em memória
+    """
+    old_row = next(old_rows, None)
+    new_row = next(new_rows, None)
+    
+    while old_row is not None or new_row is not None:
+        if new_row is None:
+            yield old_row, None
+            old_row = next(old_rows, None)
+            continue
+        if old_row is None:
+            yield None, new_row
+            new_row = next(new_rows, None)
+            continue
+        
+        old_id = str(old_row[id_field])
+        new_id = str(new_row[id_field])
+        
+        # Avançar o lado de menor id (ambos quando iguais)
+        if old_id == new_id:
+            yield old_row, new_row
+            old_row = next(old_rows, None)
+            new_row = next(new_rows, None)
+        elif old_id < new_id:
+            yield old_row, None
+            old_row = next(old_rows, None)
+        else:
+            yield None, new_row
+            new_row = next(new_rows, None)
+
 class FuncionarioUfprAnalyzer:
     def __init__(self):
         self.postgres_conn = None
@@ -74,46 +122,49 @@ class FuncionarioUfprAnalyzer:
             self.mongo_client = MongoClient(MONGO_CONFIG['connection_string'])
             self.mongo_db = self.mongo_client[MONGO_CONFIG['database']]
             self.collection = self.mongo_db['caf_funcionario_ufpr']
+            self.collection.create_index([('idMaoDeObra', 1), ('dataAtualizacao', 1)])
             logging.info("Conectado ao MongoDB")
             
         except Exception as e:
             logging.error(f"Erro ao conectar aos bancos: {e}")
             raise
     
-    def get_funcionario_data(self, schema: str) -> List[Dict[str, Any]]:
-        """Busca dados dos funcionários UFPR com JOIN nas tabelas relacionadas"""
+    def get_funcionario_data(self, schema: str) -> Iterator[Dict[str, Any]]:
+        """
+        Itera sobre os funcionários UFPR com JOIN nas tabelas relacionadas.
+        Usa cursor nomeado (server-side): as linhas chegam em lotes, ordenadas
+        pelo id em ordem binária, que é a mesma da comparação de str no Python
+        """
         query = f"""
-        SELECT DISTINCT
-            fu.id_funcionario_ufpr,
-            fu.id_unidade_familiar,
-            fu.id_pessoa_fisica,
-            fu.dt_criacao,
-            pf.nm_pessoa_fisica,
-            pf.dt_nascimento,
-            pf.nr_cpf,
-            pf.dt_atualizacao,
-            s.id_sexo,
-            s.nm_sexo
-        FROM {schema}."S_FUNCIONARIO_UFPR" fu
-        INNER JOIN {schema}."S_PESSOA_FISICA" pf ON fu.id_pessoa_fisica = pf.id_pessoa_fisica
-        INNER JOIN {schema}."S_UNIDADE_FAMILIAR" uf ON fu.id_unidade_familiar = uf.id_unidade_familiar
-        LEFT JOIN {schema}."S_SEXO" s ON pf.id_sexo = s.id_sexo
-        WHERE uf.id_tipo_situacao_unidade_familiar = 1
-        ORDER BY fu.id_funcionario_ufpr;
+        SELECT * FROM (
+            SELECT DISTINCT
+                fu.id_funcionario_ufpr,
+                fu.id_unidade_familiar,
+                fu.id_pessoa_fisica,
+                fu.dt_criacao,
+                pf.nm_pessoa_fisica,
+                pf.dt_nascimento,
+                pf.nr_cpf,
+                pf.dt_atualizacao,
+                s.id_sexo,
+                s.nm_sexo
+            FROM {schema}."S_FUNCIONARIO_UFPR" fu
+            INNER JOIN {schema}."S_PESSOA_FISICA" pf ON fu.id_pessoa_fisica = pf.id_pessoa_fisica
+            INNER JOIN {schema}."S_UNIDADE_FAMILIAR" uf ON fu.id_unidade_familiar = uf.id_unidade_familiar
+            LEFT JOIN {schema}."S_SEXO" s ON pf.id_sexo = s.id_sexo
+            WHERE uf.id_tipo_situacao_unidade_familiar = 1
+        ) funcionarios
+        ORDER BY id_funcionario_ufpr::text COLLATE "C";
         """
         
-        cursor = self.postgres_conn.cursor()
+        cursor = self.postgres_conn.cursor(name=f'fu_{schema}', cursor_factory=RealDictCursor)
+        cursor.itersize = STREAM_ITERSIZE
         cursor.execute(query)
         
-        columns = [desc[0] for desc in cursor.description]
-        results = []
-        
-        for row in cursor.fetchall():
-            row_dict = dict(zip(columns, row))
-            results.append(row_dict)
-        
-        cursor.close()
-        return results
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
     
     def convert_to_mongo_format(self, postgres_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Converte dados do PostgreSQL para formato MongoDB"""
@@ -130,7 +181,6 @@ class FuncionarioUfprAnalyzer:
                 data_nascimento = data_nascimento.isoformat()
             
             doc = {
-                '_id': str(uuid.uuid4()),
                 'idUnidadeFamiliar': str(row.get('id_unidade_familiar', '')),
                 'dataAtualizacao': data_atualizacao,
                 'idMaoDeObra': str(row.get('id_funcionario_ufpr', '')),
@@ -152,89 +202,104 @@ class FuncionarioUfprAnalyzer:
         
         return mongo_docs
     
-    def get_mapped_fields(self, doc: Dict[str, Any]) -> Dict[str, Any]:
-        """Extrai apenas os campos mapeados do documento para comparação"""
-        mapped = {}
-        
-        for mongo_field, postgres_field in FIELD_MAPPING.items():
-            if '.' in mongo_field:
-                # Campo aninhado
-                parts = mongo_field.split('.')
-                if parts[0] == 'pessoaFisica':
-                    if parts[1] == 'sexo' and len(parts) == 3:
-                        # pessoaFisica.sexo.id ou pessoaFisica.sexo.nome
-                        if doc.get('pessoaFisica', {}).get('sexo'):
-                            mapped[mongo_field] = doc['pessoaFisica']['sexo'].get(parts[2])
-                    else:
-                        # pessoaFisica.campo
-                        if doc.get('pessoaFisica'):
-                            mapped[mongo_field] = doc['pessoaFisica'].get(parts[1])
-            else:
-                # Campo raiz
-                mapped[mongo_field] = doc.get(mongo_field)
-        
-        return mapped
+    def row_has_changes(self, old_row: Dict[str, Any], new_row: Dict[str, Any]) -> bool:
+        """
+        Verifica mudanças nos campos mapeados direto nas linhas do PostgreSQL,
+        com a mesma normalização de vazios de convert_to_mongo_format
+        """
+        for field in COMPARED_COLUMNS:
+            old_value = old_row.get(field)
+            new_value = new_row.get(field)
+            if field in EMPTY_AS_NONE_COLUMNS:
+                old_value = old_value or None
+                new_value = new_value or None
+            if old_value != new_value:
+                return True
+        return False
     
-    def has_changes(self, old_doc: Dict[str, Any], new_doc: Dict[str, Any]) -> bool:
-        """Verifica se houve mudanças nos campos mapeados"""
-        old_mapped = self.get_mapped_fields(old_doc)
-        new_mapped = self.get_mapped_fields(new_doc)
+    def save_versions(self, versions: List[Dict[str, Any]]) -> int:
+        """
+        Insere em lote as versões anteriores ainda não registradas no MongoDB.
+        A existência de (idMaoDeObra, dataAtualizacao) é verificada com uma
+        única consulta por lote
+        """
+        existing = set()
+        for doc in self.collection.find(
+            {'idMaoDeObra': {'$in': [version['idMaoDeObra'] for version in versions]}},
+            {'idMaoDeObra': 1, 'dataAtualizacao': 1}
+        ):
+            existing.add((doc.get('idMaoDeObra'), doc.get('dataAtualizacao')))
+        
+        operations = []
+        for version in versions:
+            key = (version['idMaoDeObra'], version['dataAtualizacao'])
+            if key in existing:
+                continue
+            existing.add(key)
+            # _id (UUID em texto, como nas versões já gravadas) só para o que será inserido
+            version['_id'] = str(uuid.uuid4())
+            operations.append(pymongo.InsertOne(version))
+            logging.info(f"Nova versão criada para funcionário {version['idMaoDeObra']}")
         
-        return old_mapped != new_mapped
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
     
     def process_incremental_analysis(self, old_schema: str, new_schema: str, limit: Optional[int] = None):
         """Processa análise incremental entre dois schemas"""
         logging.info(f"Iniciando análise incremental: {old_schema} -> {new_schema}")
         
-        # Buscar dados dos dois períodos
-        old_data = self.get_funcionario_data(old_schema)
-        new_data = self.get_funcionario_data(new_schema)
-        
-        logging.info(f"Período anterior ({old_schema}): {len(old_data)} funcionários")
-        logging.info(f"Período atual ({new_schema}): {len(new_data)} funcionários")
-        
-        # Converter para formato MongoDB
-        old_docs = self.convert_to_mongo_format(old_data)
-        new_docs = self.convert_to_mongo_format(new_data)
-        
-        # Criar índices por ID para comparação rápida
-        old_by_id = {doc['idMaoDeObra']: doc for doc in old_docs}
-        new_by_id = {doc['idMaoDeObra']: doc for doc in new_docs}
+        # Percorrer os dois períodos em paralelo (merge pelo id): apenas
+        # uma linha de cada lado fica em memória
+        old_stream = self.get_funcionario_data(old_schema)
+        new_stream = self.get_funcionario_data(new_schema)
+        old_total = 0
+        new_total = 0
         
         # Análise de mudanças
         changes_found = 0
         new_versions_created = 0
+        pending_versions = []
+        inserted_at = datetime.now(timezone.utc)
+        
+        # Com o limite atingido o restante não é lido e os totais ficam parciais
+        totals_partial = False
         
-        for funcionario_id, new_doc in new_by_id.items():
+        for old_row, new_row in merge_rows_by_id(old_stream, new_stream, 'id_funcionario_ufpr'):
             if limit and changes_found >= limit:
                 logging.info(f"Limite de {limit} alterações atingido")
+                totals_partial = True
                 break
-                
-            old_doc = old_by_id.get(funcionario_id)
             
-            if old_doc and self.has_changes(old_doc, new_doc):
+            old_total += old_row is not None
+            new_total += new_row is not None
+            
+            if old_row is not None and new_row is not None and self.row_has_changes(old_row, new_row):
                 changes_found += 1
+                old_doc = self.convert_to_mongo_format([old_row])[0]
                 
-                # Verificar se já existe uma versão no MongoDB
-                existing_doc = self.collection.find_one({
-                    'idMaoDeObra': funcionario_id,
-                    'dataAtualizacao': old_doc['dataAtualizacao']
-                })
+                # Adicionar metadados de versionamento
+                old_doc['_metadata'] = {
+                    'schemaOrigin': old_schema,
+                    'schemaComparison': new_schema,
+                    'insertedAt': inserted_at,
+                    'reason': 'incremental_change_detected'
+                }
+                pending_versions.append(old_doc)
                 
-                if not existing_doc:
-                    # Adicionar metadados de versionamento
-                    old_doc['_metadata'] = {
-                        'schemaOrigin': old_schema,
-                        'schemaComparison': new_schema,
-                        'insertedAt': datetime.now(timezone.utc),
-                        'reason': 'incremental_change_detected'
-                    }
-                    
-                    # Inserir versão anterior no MongoDB
-                    self.collection.insert_one(old_doc)
-                    new_versions_created += 1
-                    
-                    logging.info(f"Nova versão criada para funcionário {funcionario_id}")
+                if len(pending_versions) >= MONGO_BULK_BATCH_SIZE:
+                    new_versions_created += self.save_versions(pending_versions)
+                    pending_versions = []
+        
+        if pending_versions:
+            new_versions_created += self.save_versions(pending_versions)
+        
+        old_stream.close()
+        new_stream.close()
+        
+        totals_label = " (parcial, limite atingido)" if totals_partial else ""
+        logging.info(f"Período anterior ({old_schema}): {old_total} funcionários{totals_label}")
+        logging.info(f"Período atual ({new_schema}): {new_total} funcionários{totals_label}")
         
         logging.info(f"Resumo da análise:")
         logging.info(f"   - Funcionários com alterações: {changes_found}")
@@ -243,8 +308,9 @@ class FuncionarioUfprAnalyzer:
         return {
             'changes_found': changes_found,
             'new_versions_created': new_versions_created,
-            'old_total': len(old_data),
-            'new_total': len(new_data)
+            'old_total': old_total,
+            'new_total': new_total,
+            'totals_partial': totals_partial
         }
     
     def close_connections(self):
@@ -0,0 +1,50 @@
+"""
+Testes para a lista de SELECT da detecção de alterações de área imóvel
+"""
+
+import unittest
+from pathlib import Path
+import sys
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_caf_analysis_area_imovel import CAFAreaImovelFieldMapper
+
+
+class TestAreaImovelDiffSelectClause(unittest.TestCase):
+    
+    def setUp(self):
+        # Mapeamento montado direto, sem ler o CSV
+        self.mapper = CAFAreaImovelFieldMapper.__new__(CAFAreaImovelFieldMapper)
+        self.mapper.mapping = {
+            'area': {'postgres_table': 'S_AREA_IMOVEL', 'postgres_field': 'nr_area'},
+            'incra': {'postgres_table': 'S_AREA_IMOVEL', 'postgres_field': 'st_incra'},
+            'latitude': {'postgres_table': 'S_AREA_IMOVEL', 'postgres_field': 'nr_latitude'},
+        }
+    
+    def test_all_fields_present(self):
+        """Um indicador por campo, com alias posicional"""
+        mongo_fields, clause = self.mapper.get_diff_select_clause(
+            {'nr_area', 'st_incra', 'nr_latitude'}
+        )
+        
+        self.assertEqual(mongo_fields, ['area', 'incra', 'latitude'])
+        self.assertIn('(t1."nr_area" IS DISTINCT FROM t2."nr_area") AS "chg_0"', clause)
+        self.assertIn('(t1."nr_latitude" IS DISTINCT FROM t2."nr_latitude") AS "chg_2"', clause)
+    
+    def test_missing_column_is_skipped(self):
+        """Coluna fora do conjunto comum não entra e não ocupa alias"""
+        mongo_fields, clause = self.mapper.get_diff_select_clause({'nr_area', 'nr_latitude'})
+        
+        self.assertEqual(mongo_fields, ['area', 'latitude'])
+        self.assertNotIn('st_incra', clause)
+        self.assertIn('(t1."nr_latitude" IS DISTINCT FROM t2."nr_latitude") AS "chg_1"', clause)
+    
+    def test_no_common_columns(self):
+        """Sem colunas em comum não há campos comparáveis"""
+        self.assertEqual(self.mapper.get_diff_select_clause(set()), ([], ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
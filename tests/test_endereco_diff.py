@@ -0,0 +1,59 @@
+"""
+Testes para a lista de SELECT da detecção de alterações de endereços
+"""
+
+import unittest
+from pathlib import Path
+import sys
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_caf_analysis_endereco import get_endereco_diff_select_clause
+
+
+class TestEnderecoDiffSelectClause(unittest.TestCase):
+    
+    def test_fields_present_on_both_sides(self):
+        """Cada campo gera indicador e os dois valores condicionais"""
+        clause = get_endereco_diff_select_clause(
+            [('nr_cep', 'cep')], {'id_endereco', 'nr_cep'}, {'id_endereco', 'nr_cep'}
+        )
+        
+        self.assertEqual(clause, ', '.join([
+            't1."id_endereco"',
+            't2."id_endereco"',
+            '(t1."nr_cep" IS DISTINCT FROM t2."nr_cep")',
+            'CASE WHEN (t1."nr_cep" IS DISTINCT FROM t2."nr_cep") THEN t1."nr_cep" END',
+            'CASE WHEN (t1."nr_cep" IS DISTINCT FROM t2."nr_cep") THEN t2."nr_cep" END',
+        ]))
+    
+    def test_field_missing_from_old_schema(self):
+        """Campo ausente no schema antigo vale NULL desse lado"""
+        clause = get_endereco_diff_select_clause(
+            [('ds_referencia', 'referencia')], {'id_endereco'}, {'id_endereco', 'ds_referencia'}
+        )
+        
+        self.assertIn('(NULL IS DISTINCT FROM t2."ds_referencia")', clause)
+        self.assertNotIn('t1."ds_referencia"', clause)
+    
+    def test_field_missing_from_new_schema(self):
+        """Campo ausente no schema novo vale NULL desse lado"""
+        clause = get_endereco_diff_select_clause(
+            [('ds_referencia', 'referencia')], {'id_endereco', 'ds_referencia'}, {'id_endereco'}
+        )
+        
+        self.assertIn('(t1."ds_referencia" IS DISTINCT FROM NULL)', clause)
+        self.assertNotIn('t2."ds_referencia"', clause)
+    
+    def test_three_expressions_per_field(self):
+        """A posição das colunas no resultado segue a ordem dos campos"""
+        clause = get_endereco_diff_select_clause(
+            [('nr_cep', 'cep'), ('sg_uf', 'uf')], {'nr_cep'}, {'sg_uf'}
+        )
+        
+        self.assertEqual(len(clause.split(', ')), 2 + 3 * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Testes para o merge por id e a comparação de linhas da análise de funcionários UFPR
+"""
+
+import unittest
+from pathlib import Path
+import sys
+
+# Adicionar a raiz do projeto ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from run_caf_analysis_funcionario_ufpr import FuncionarioUfprAnalyzer, merge_rows_by_id
+
+
+def _rows(*ids):
+    """Linhas mínimas com o id de funcionário"""
+    return iter([{'id_funcionario_ufpr': row_id} for row_id in ids])
+
+
+def _ids(pairs):
+    """Ids de cada par (None no lado ausente)"""
+    return [
+        (old and old['id_funcionario_ufpr'], new and new['id_funcionario_ufpr'])
+        for old, new in pairs
+    ]
+
+
+class TestMergeRowsById(unittest.TestCase):
+    
+    def test_same_ids(self):
+        """Ids presentes nos dois lados formam pares completos"""
+        pairs = merge_rows_by_id(_rows('a', 'b'), _rows('a', 'b'), 'id_funcionario_ufpr')
+        self.assertEqual(_ids(pairs), [('a', 'a'), ('b', 'b')])
+    
+    def test_ids_only_on_one_side(self):
+        """Id removido ou incluído gera par com None no outro lado"""
+        pairs = merge_rows_by_id(_rows('a', 'b', 'd'), _rows('a', 'c', 'd'), 'id_funcionario_ufpr')
+        self.assertEqual(_ids(pairs), [('a', 'a'), ('b', None), (None, 'c'), ('d', 'd')])
+    
+    def test_tail_of_longer_side(self):
+        """O restante do lado mais longo é produzido após o outro terminar"""
+        pairs = merge_rows_by_id(_rows('a'), _rows('a', 'b', 'c'), 'id_funcionario_ufpr')
+        self.assertEqual(_ids(pairs), [('a', 'a'), (None, 'b'), (None, 'c')])
+        
+        pairs = merge_rows_by_id(_rows('b', 'c'), _rows(), 'id_funcionario_ufpr')
+        self.assertEqual(_ids(pairs), [('b', None), ('c', None)])
+    
+    def test_empty_sides(self):
+        """Dois lados vazios não geram pares"""
+        self.assertEqual(list(merge_rows_by_id(_rows(), _rows(), 'id_funcionario_ufpr')), [])
+    
+    def test_ids_compared_as_str(self):
+        """Ids não textuais (ex.: UUID) são comparados pela forma em texto"""
+        pairs = merge_rows_by_id(_rows(10, 9), _rows('10', '9'), 'id_funcionario_ufpr')
+        self.assertEqual(_ids(pairs), [(10, '10'), (9, '9')])
+
+
+class TestRowHasChanges(unittest.TestCase):
+    
+    def setUp(self):
+        self.analyzer = FuncionarioUfprAnalyzer()
+        self.row = {
+            'id_funcionario_ufpr': 'a',
+            'nm_pessoa_fisica': 'Maria',
+            'nm_sexo': None,
+        }
+    
+    def test_empty_sexo_equals_null(self):
+        """'' e NULL em nm_sexo são gravados igualmente e não são alteração"""
+        self.assertFalse(self.analyzer.row_has_changes(self.row, dict(self.row, nm_sexo='')))
+    
+    def test_changed_field(self):
+        """Campo mapeado diferente é alteração"""
+        self.assertTrue(
+            self.analyzer.row_has_changes(self.row, dict(self.row, nm_pessoa_fisica='Maria José'))
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
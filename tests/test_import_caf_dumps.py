@@ -0,0 +1,77 @@
+"""
+Testes para a extração de datas e o agrupamento por schema do importador de dumps CAF
+"""
+
+import unittest
+from pathlib import Path
+import sys
+
+# Adicionar postgres-scripts ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'postgres-scripts'))
+
+from import_caf_dumps import CAFDumpImporter
+
+
+class TestExtractDateFromFilename(unittest.TestCase):
+    
+    def setUp(self):
+        self.importer = CAFDumpImporter({})
+    
+    def test_dump_caf_pattern_has_priority(self):
+        """O padrão dump-caf_*-AAAAMMDD-N vence o sufixo de 12 dígitos"""
+        date_str = self.importer.extract_date_from_filename(
+            'dump-caf_mapa-20250301-202506151151.sql'
+        )
+        self.assertEqual(date_str, '20250301')
+        
+        # Outra sequência de 8 dígitos após "caf" não tem precedência
+        date_str = self.importer.extract_date_from_filename(
+            'dump-caf_v20240101-20250301-202506151151.sql'
+        )
+        self.assertEqual(date_str, '20250301')
+    
+    def test_caf_prefix_pattern(self):
+        """Data logo após "caf", com ou sem separador"""
+        self.assertEqual(self.importer.extract_date_from_filename('caf20250401.sql'), '20250401')
+        self.assertEqual(self.importer.extract_date_from_filename('caf_20250401.dump'), '20250401')
+    
+    def test_caf_pattern_before_dashed_date(self):
+        """Oito dígitos após "caf" vencem uma data AAAA-MM-DD anterior no nome"""
+        date_str = self.importer.extract_date_from_filename('2024-12-31_caf_20250501.sql')
+        self.assertEqual(date_str, '20250501')
+    
+    def test_dashed_date_pattern(self):
+        """Data AAAA-MM-DD é convertida para AAAAMMDD"""
+        date_str = self.importer.extract_date_from_filename('backup-2025-06-01.sql')
+        self.assertEqual(date_str, '20250601')
+    
+    def test_plain_digits_pattern(self):
+        """Oito dígitos soltos são o último recurso"""
+        self.assertEqual(self.importer.extract_date_from_filename('backup_20250701.sql'), '20250701')
+    
+    def test_no_date(self):
+        """Nome sem data não gera data"""
+        self.assertIsNone(self.importer.extract_date_from_filename('caf_mapa.sql'))
+
+
+class TestGroupDumpsBySchema(unittest.TestCase):
+    
+    def setUp(self):
+        self.importer = CAFDumpImporter({})
+    
+    def test_same_date_dumps_share_group(self):
+        """Dumps da mesma data vão para o mesmo grupo, na ordem recebida"""
+        dumps = [
+            Path('caf_20250301_a.sql'),
+            Path('caf_20250301_b.sql'),
+            Path('caf_20250401.sql'),
+        ]
+        groups = self.importer.group_dumps_by_schema(dumps)
+        
+        self.assertEqual(list(groups), ['caf_20250301', 'caf_20250401'])
+        self.assertEqual(groups['caf_20250301'], dumps[:2])
+        self.assertEqual(groups['caf_20250401'], dumps[2:])
+
+
+if __name__ == '__main__':
+    unittest.main()